@@ -1,8 +1,6 @@
 import mesa
 import numpy as np
 
-from numpy import random
-
 from cooperator import Cooperator
 from defector import Defector
 
@@ -13,18 +11,31 @@ agent_punishment = 3
 
 class PublicGoodGame(mesa.Model):
     def __init__(self, num_cooperators, defector_ratio, altruistic_punishment_freq, width=10,
-                 height=10):
+                 height=10, seed=None, use_kernels=False):
         super().__init__(num_cooperators, defector_ratio, altruistic_punishment_freq, width,
                          height)
+        # Agents draw from the global NumPy generator, the grid and schedule from self.random
+        if seed is not None:
+            self.reset_randomizer(seed)
+            np.random.seed(seed)
         self.num_cooperators = num_cooperators
         self.num_defectors = round(self.num_cooperators * defector_ratio)
         self.defector_ratio = defector_ratio
+        # Total of all contributions made so far. Each tick the contributions are multiplied
+        # and paid back out to the agents in full, so this is a record, not a balance
         self.common_pool = 0
         self.multiplier = 1.6
         self.investment = 0
         self.schedule = mesa.time.RandomActivation(self)
         self.altruistic_punishment_freq = altruistic_punishment_freq
-        self.transform = self.transform_agent()
+        # Step the agents with the array kernels instead of one agent at a time
+        self.use_kernels = use_kernels
+
+        # Settlement ledger: contributions posted by agents during the current tick
+        self.ledger = {}
+        self.tick_investment = 0
+        self.cooperator_count = 0
+        self.defector_count = 0
         self.payoff = self.calculate_payoff()
         self.grid = mesa.space.MultiGrid(width, height, True)
         self.datacollector = mesa.DataCollector(
@@ -56,8 +67,7 @@ class PublicGoodGame(mesa.Model):
             # Add the agent to a random grid cell
             x = self.random.randrange(self.grid.width)
             y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(a, (x, y))
-            self.schedule.add(a)
+            self.add_agent(a, (x, y))
             self.datacollector.collect(self)
 
         # Create Defector
@@ -69,77 +79,114 @@ class PublicGoodGame(mesa.Model):
             # Add the agent to a random grid cell
             x = self.random.randrange(self.grid.width)
             y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(b, (x, y))
-            self.schedule.add(b)
+            self.add_agent(b, (x, y))
             self.datacollector.collect(self)
 
-    def set_investment(self, investment):
+    def add_agent(self, agent, pos):
         """
 
-        This method calculates the investment amount of each agent belonging to the
-        Cooperator and Defector classes and sums it all up.
+        Places an agent on the grid and the schedule and updates the live population counts
 
         """
-        cooperator_investment = 0
-        defector_investment = 0
-        # Calculate investment for each Cooperator instance
-        for agent in self.schedule.agents:
-            if isinstance(agent, Cooperator):
-                cooperator_investment += agent.calculate_invest()
+        self.grid.place_agent(agent, pos)
+        self.schedule.add(agent)
+        if isinstance(agent, Cooperator):
+            self.cooperator_count += 1
+        elif isinstance(agent, Defector):
+            self.defector_count += 1
+
+    def remove_agent(self, agent):
+        """
 
-        # Calculate investment for each Defector instance
-        for agent in self.schedule.agents:
-            if isinstance(agent, Defector):
-                defector_investment += agent.calculate_invest()
+        Removes an agent from the grid and the schedule and updates the live population counts
+
+        """
+        self.grid.remove_agent(agent)
+        self.schedule.remove(agent)
+        if isinstance(agent, Cooperator):
+            self.cooperator_count -= 1
+        elif isinstance(agent, Defector):
+            self.defector_count -= 1
+
+    def post_contribution(self, agent, amount):
+        """
+
+        Records the realized contribution of an agent for the current tick.
+        Posting twice within a tick replaces the earlier amount.
+
+        """
+        previous = self.ledger.get(agent.unique_id, 0)
+        self.ledger[agent.unique_id] = amount
+        self.tick_investment += amount - previous
+
+    def set_investment(self, investment):
+        """
 
-        investment = cooperator_investment + defector_investment
+        This method adds the contributions posted during the tick to the
+        cumulative investment and the common pool total.
+
+        """
         self.investment += investment
         self.common_pool += investment
 
     def calculate_payoff(self):
         """
 
-        This method calculates the payoff of each agent
+        This method calculates the payoff of each agent from the contributions of the current tick
 
         """
-        print(self.investment)
-        print(self.common_pool)
-        self.payoff = (self.investment * self.multiplier) / (self.num_cooperators + self.num_defectors)
+        population = self.cooperator_count + self.defector_count
+        if population > 0:
+            self.payoff = (self.tick_investment * self.multiplier) / population
+        else:
+            self.payoff = 0
 
         return self.payoff
 
+    def settle(self):
+        """
+
+        Settles the ledger of the current tick in a single pass: every agent pays the
+        contribution it posted and receives an equal share of the multiplied contributions
+
+        """
+        self.set_investment(self.tick_investment)
+        payoff = self.calculate_payoff()
+        for agent in self.schedule.agents:
+            agent.wealth += payoff - self.ledger.get(agent.unique_id, 0)
+
+        self.ledger.clear()
+        self.tick_investment = 0
+
     # def common_pool_wealth(self):
     #     self.common_pool += self.calculate_payoff()
 
     def agent_transform(self):
         """
 
-        A method that mutates agents according to their investment behaviors
+        A method that mutates agents according to the investment they posted in the current tick
 
         """
         for agent in self.schedule.agents:
-            if isinstance(agent, Defector) and agent.calculate_invest() > 2:  # fixed loss amount
+            invest = self.ledger.get(agent.unique_id, 0)
+            if isinstance(agent, Defector) and invest > 2:  # fixed loss amount
                 wealth = agent.wealth
                 id = agent.unique_id
                 new_agent = Cooperator(id, self, wealth)
                 # Add the new agent to grid and remove old one
                 x = self.random.randrange(self.grid.width)
                 y = self.random.randrange(self.grid.height)
-                self.grid.remove_agent(agent)
-                self.schedule.remove(agent)
-                self.grid.place_agent(new_agent, (x, y))
-                self.schedule.add(new_agent)
-            elif isinstance(agent, Cooperator) and agent.calculate_invest() == 2:  # fixed loss amount
+                self.remove_agent(agent)
+                self.add_agent(new_agent, (x, y))
+            elif isinstance(agent, Cooperator) and invest == 2:  # fixed loss amount
                 wealth = agent.wealth
                 id = agent.unique_id
                 new_agent = Defector(id, self, wealth)
                 # Add the new agent to grid and remove old one
                 x = self.random.randrange(self.grid.width)
                 y = self.random.randrange(self.grid.height)
-                self.grid.remove_agent(agent)
-                self.schedule.remove(agent)
-                self.grid.place_agent(new_agent, (x, y))
-                self.schedule.add(new_agent)
+                self.remove_agent(agent)
+                self.add_agent(new_agent, (x, y))
 
     def altruistic_punishment(self):
         for agent in self.schedule.agents:
@@ -190,27 +237,67 @@ class PublicGoodGame(mesa.Model):
         elif ap_freq < self.altruistic_punishment_freq:
             pass
 
+    def step_agents(self):
+        """
+
+        Array version of self.schedule.step(). Agents move in the same random activation order,
+        then every agent with wealth invests and updates its moral worth in one kernel call per
+        agent type, drawing the same random numbers in the same order as Cooperator.step and
+        Defector.step would
+
+        """
+        import kernels
+
+        agents = {agent.unique_id: agent for agent in self.schedule.agents}
+        order = [agents[key] for key in self.schedule.get_agent_keys(shuffle=True)]
+        for agent in order:
+            agent.move()
+
+        active = [agent for agent in order if agent.wealth > 0]
+        draws = np.random.random(len(active))
+        invest = np.zeros(len(active))
+        for agent_type, probability_bands, contribution_bands in (
+                (Cooperator, kernels.cooperator_probability_bands, kernels.cooperator_contribution_bands),
+                (Defector, kernels.defector_probability_bands, kernels.defector_contribution_bands)):
+            index = [i for i, agent in enumerate(active) if isinstance(agent, agent_type)]
+            moral_worth = [active[i].moral_worth for i in index]
+            wealth = [active[i].wealth for i in index]
+            invest[index], moral_worth = kernels.step_agents(moral_worth, wealth, probability_bands,
+                                                             contribution_bands, draws[index])
+            for i, value in zip(index, moral_worth):
+                active[i].moral_worth = float(value)
+
+        # Post in activation order so the pool total adds up exactly as in schedule.step()
+        for agent, amount in zip(active, invest):
+            agent.invest = float(amount)
+            self.post_contribution(agent, agent.invest)
+
+        self.schedule.steps += 1
+        self.schedule.time += 1
+
     def step(self):
         self.datacollector.collect(self)
-        self.schedule.step()
+        if self.use_kernels:
+            self.step_agents()
+        else:
+            self.schedule.step()
         self.altruistic_punishment()
         self.antisocial_punishment_initiator()
         self.agent_transform()
-        self.set_investment(self.investment)
-        self.calculate_payoff()
+        self.settle()
 
 
 
 # Agent Count
 
 def count_agent_cooperator(model):
-    num_cooperator = sum(1 for agent in model.schedule.agents if isinstance(agent, Cooperator))
+    num_cooperator = model.cooperator_count
 
     return num_cooperator
 
 
 def count_agent_defector(model):
-    num_defector = sum(1 for agent in model.schedule.agents if isinstance(agent, Defector))
+    num_defector = model.defector_count
 
     return num_defector
 
@@ -1,5 +1,4 @@
 import mesa
-import random
 
 from numpy import random
 
@@ -87,14 +86,14 @@ class Cooperator(mesa.Agent):
         """
 
         This function is supposed to give moral worth to cooperators
-        according to their contribution behaviors
+        according to the contribution they made in the current tick
 
         """
-        if 1 <= self.calculate_invest() <= 5:
+        if 1 <= self.invest <= 5:
             self.moral_worth += 1
-        elif 6 <= self.calculate_invest() <= 10:
+        elif 6 <= self.invest <= 10:
             self.moral_worth += 2
-        elif self.calculate_invest() >= 11:
+        elif self.invest >= 11:
             self.moral_worth += 3
         else:
             self.moral_worth -= 1
@@ -121,9 +120,8 @@ class Cooperator(mesa.Agent):
     def step(self):
         self.move()
         if self.wealth > 0:
-            self.calculate_probability_contributing()
-            self.calculate_contribution_amount()
-            self.calculate_invest()
+            self.invest = self.calculate_invest()
+            self.model.post_contribution(self, self.invest)
             self.moral_worth_assignment()
             # self.public_good_game.altruistic_punishment()
             # self.public_good_game.antisocial_punishment_initiator()
@@ -0,0 +1,178 @@
+import numpy as np
+
+# Parameters
+# Payoffs
+fixed_loss = 2
+
+# Behavior bands, indexed by the moral worth band of an agent:
+# 0 <= moral worth <= 4, 5 <= moral worth <= 10, 11 <= moral worth <= 20, anything else
+cooperator_probability_bands = np.array([0.6, 0.8, 0.9, 0.4])
+cooperator_contribution_bands = np.array([0.5, 0.7, 0.9, 0.4])
+defector_probability_bands = np.array([0.1, 0.2, 0.3, 0.0])
+defector_contribution_bands = np.array([0.2, 0.3, 0.5, 0.1])
+
+
+# NumPy kernels
+
+def _band_index_numpy(moral_worth):
+    return np.select(
+        [(0 <= moral_worth) & (moral_worth <= 4),
+         (5 <= moral_worth) & (moral_worth <= 10),
+         (11 <= moral_worth) & (moral_worth <= 20)],
+        [0, 1, 2],
+        default=3,
+    )
+
+
+def _step_agents_numpy(moral_worth, wealth, probability_bands, contribution_bands, draws):
+    band = _band_index_numpy(moral_worth)
+    contribution = wealth * contribution_bands[band] + fixed_loss
+    invest = np.where(probability_bands[band] >= draws, contribution, fixed_loss)
+    delta = np.select(
+        [(1 <= invest) & (invest <= 5),
+         (6 <= invest) & (invest <= 10),
+         invest >= 11],
+        [1, 2, 3],
+        default=-1,
+    )
+    active = wealth > 0
+    invest = np.where(active, invest, 0)
+    new_moral_worth = np.where(active, moral_worth + delta, moral_worth)
+
+    return invest, new_moral_worth
+
+
+# Loop kernels, compiled with Numba when it is installed
+
+def _band_index_loop(moral_worth):
+    band = np.empty(moral_worth.shape[0], dtype=np.int64)
+    for i in range(moral_worth.shape[0]):
+        value = moral_worth[i]
+        if 0 <= value and value <= 4:
+            band[i] = 0
+        elif 5 <= value and value <= 10:
+            band[i] = 1
+        elif 11 <= value and value <= 20:
+            band[i] = 2
+        else:
+            band[i] = 3
+
+    return band
+
+
+def _step_agents_loop(moral_worth, wealth, probability_bands, contribution_bands, draws):
+    n = moral_worth.shape[0]
+    invest = np.zeros(n, dtype=np.float64)
+    new_moral_worth = np.empty(n, dtype=np.float64)
+    band = _band_index_loop(moral_worth)
+    for i in range(n):
+        new_moral_worth[i] = moral_worth[i]
+        if not wealth[i] > 0:
+            continue
+
+        if probability_bands[band[i]] >= draws[i]:
+            amount = wealth[i] * contribution_bands[band[i]] + fixed_loss
+        else:
+            amount = fixed_loss
+        invest[i] = amount
+
+        if 1 <= amount and amount <= 5:
+            new_moral_worth[i] += 1
+        elif 6 <= amount and amount <= 10:
+            new_moral_worth[i] += 2
+        elif amount >= 11:
+            new_moral_worth[i] += 3
+        else:
+            new_moral_worth[i] -= 1
+
+    return invest, new_moral_worth
+
+
+_backend = None
+_band_index = None
+_step_agents = None
+
+
+def _load_backend():
+    """
+
+    Picks the kernels on first use, so that importing this module does not import Numba
+
+    """
+    global _backend, _band_index, _step_agents, _band_index_loop, _step_agents_loop
+    try:
+        import numba
+    except ImportError:
+        _backend = "numpy"
+        _band_index = _band_index_numpy
+        _step_agents = _step_agents_numpy
+    else:
+        _band_index_loop = numba.njit(cache=True)(_band_index_loop)
+        _step_agents_loop = numba.njit(cache=True)(_step_agents_loop)
+        _backend = "numba"
+        _band_index = _band_index_loop
+        _step_agents = _step_agents_loop
+
+
+def __getattr__(name):
+    if name == "backend":
+        if _backend is None:
+            _load_backend()
+        return _backend
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Public kernels over agent arrays
+
+def band_index(moral_worth):
+    """
+
+    Returns the behavior band (0 to 3) of each agent according to its moral worth
+
+    """
+    if _backend is None:
+        _load_backend()
+
+    return _band_index(np.asarray(moral_worth, dtype=np.float64))
+
+
+def calculate_probability_contributing(moral_worth, probability_bands):
+    """
+
+    Array version of calculate_probability_contributing for a whole population
+
+    """
+    return np.asarray(probability_bands, dtype=np.float64)[band_index(moral_worth)]
+
+
+def calculate_contribution_amount(moral_worth, wealth, contribution_bands):
+    """
+
+    Array version of calculate_contribution_amount for a whole population
+
+    """
+    contribution_bands = np.asarray(contribution_bands, dtype=np.float64)
+
+    return np.asarray(wealth, dtype=np.float64) * contribution_bands[band_index(moral_worth)] + fixed_loss
+
+
+def step_agents(moral_worth, wealth, probability_bands, contribution_bands, draws):
+    """
+
+    Array version of the investment and moral worth part of Cooperator.step and Defector.step.
+
+    draws holds the random number each agent compares against its probability of contributing,
+    in the order the agents are activated. Agents without wealth do not invest, draw or change
+    their moral worth, so their entries in draws are ignored.
+    Returns the investment of each agent and the updated moral worth.
+
+    """
+    if _backend is None:
+        _load_backend()
+
+    return _step_agents(np.asarray(moral_worth, dtype=np.float64),
+                        np.asarray(wealth, dtype=np.float64),
+                        np.asarray(probability_bands, dtype=np.float64),
+                        np.asarray(contribution_bands, dtype=np.float64),
+                        np.asarray(draws, dtype=np.float64))
@@ -0,0 +1,244 @@
+"""
+
+Golden trace harness for the Public Good Game.
+
+A trace records a seeded run of an engine: the reporter values of every tick and, optionally,
+a hash of the agent states. Replaying a trace runs a candidate engine with the same seed and
+parameters, reports the first tick and metric where it diverges from the trace and times the
+steps of the candidate and of the reference engine, run again under the same conditions.
+
+An engine is any callable engine(seed, **params) returning an object with step(), report()
+and, for agent hashes, agent_state() (one (unique_id, type name, wealth, moral worth) tuple
+per agent). report() returns the reporter values (name -> value) of the state the engine was
+in when its last step() began, which is how PublicGoodGame collects them. agent_state() is
+read before every step() and once after the last one, so both describe the state after the
+same number of ticks. ModelEngine adapts mesa models such as PublicGoodGame; array based
+engines implement the same three methods.
+
+Usage:
+    python replay.py record trace.json [--seed N] [--steps N] [--agent-hashes]
+    python replay.py replay trace.json [--engine module:name] [--reference module:name] [--tolerance X]
+
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import numbers
+import time
+
+default_params = {"num_cooperators": 20, "defector_ratio": 0.5, "altruistic_punishment_freq": 4}
+
+
+class ModelEngine:
+    """
+
+    Runs a mesa model class (PublicGoodGame by default) behind the engine interface.
+    The reported values are the row the model's own datacollector collected at the start of
+    the tick, so replaying does not trigger any extra reporter calls.
+
+    """
+
+    def __init__(self, seed, model_class=None, **params):
+        if model_class is None:
+            from PGG_model import PublicGoodGame
+            model_class = PublicGoodGame
+        self.model = model_class(seed=seed, **params)
+
+    def step(self):
+        self.model.step()
+
+    def report(self):
+        return {name: values[-1] for name, values in self.model.datacollector.model_vars.items()}
+
+    def agent_state(self):
+        return [(agent.unique_id, type(agent).__name__, agent.wealth, agent.moral_worth)
+                for agent in self.model.schedule.agents]
+
+
+def kernel_engine(seed, **params):
+    """
+
+    PublicGoodGame stepping its agents with the array kernels (--engine replay:kernel_engine)
+
+    """
+    return ModelEngine(seed, use_kernels=True, **params)
+
+
+def _normalize(value):
+    if isinstance(value, bool) or not isinstance(value, numbers.Number):
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)
+
+    return float(value)
+
+
+def state_hash(agent_state):
+    """
+
+    Hashes agent states independently of agent order and of Python vs NumPy number types.
+    Only the unique_id stays an integer, so a wealth of 20 and of 20.0 hash the same
+
+    """
+    rows = sorted((int(row[0]),) + tuple(float(value) if isinstance(value, numbers.Number) else value
+                                         for value in row[1:])
+                  for row in agent_state)
+
+    return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+
+def record(engine=ModelEngine, seed=0, steps=50, params=None, agent_hashes=False):
+    """
+
+    Runs an engine for a number of steps and returns its trace.
+    Entry t of "ticks" and "agent_hashes" describes the state after t ticks; "agent_hashes" has
+    one more entry for the state after the last tick. "elapsed" only counts the step() calls
+
+    """
+    params = dict(default_params if params is None else params)
+    ticks = []
+    hashes = [] if agent_hashes else None
+    elapsed = 0.0
+
+    run = engine(seed, **params)
+    for _ in range(steps):
+        if agent_hashes:
+            hashes.append(state_hash(run.agent_state()))
+        start = time.perf_counter()
+        run.step()
+        elapsed += time.perf_counter() - start
+        ticks.append({name: _normalize(value) for name, value in run.report().items()})
+    if agent_hashes:
+        hashes.append(state_hash(run.agent_state()))
+
+    return {
+        "engine": getattr(engine, "__name__", repr(engine)),
+        "seed": seed,
+        "steps": steps,
+        "params": params,
+        "ticks": ticks,
+        "agent_hashes": hashes,
+        "elapsed": elapsed,
+    }
+
+
+def compare(reference, candidate, tolerance=0.0):
+    """
+
+    Returns the first divergence between two traces as (tick, metric, expected, actual),
+    or None when they match. tick is the number of ticks run before the diverging state.
+
+    """
+    compare_hashes = bool(reference["agent_hashes"]) and bool(candidate["agent_hashes"])
+    for tick, (expected, actual) in enumerate(zip(reference["ticks"], candidate["ticks"])):
+        for metric, value in expected.items():
+            if metric not in actual:
+                return tick, metric, value, None
+            other = actual[metric]
+            if isinstance(value, numbers.Number) and isinstance(other, numbers.Number):
+                if value == other or abs(value - other) <= tolerance:
+                    continue
+            elif value == other:
+                continue
+            return tick, metric, value, other
+
+        if compare_hashes and reference["agent_hashes"][tick] != candidate["agent_hashes"][tick]:
+            return tick, "agent state", reference["agent_hashes"][tick], candidate["agent_hashes"][tick]
+
+    if len(reference["ticks"]) != len(candidate["ticks"]):
+        tick = min(len(reference["ticks"]), len(candidate["ticks"]))
+        return tick, "steps", len(reference["ticks"]), len(candidate["ticks"])
+
+    tick = len(reference["ticks"])
+    if compare_hashes and reference["agent_hashes"][tick] != candidate["agent_hashes"][tick]:
+        return tick, "agent state", reference["agent_hashes"][tick], candidate["agent_hashes"][tick]
+
+    return None
+
+
+def replay(trace, engine=ModelEngine, reference=ModelEngine, tolerance=0.0):
+    """
+
+    Runs a candidate engine with the settings of a trace and compares it with the trace.
+    The reference engine is run again under the same conditions as the candidate to time it;
+    "recorded_time" is the time stored in the trace, which may come from another machine
+
+    """
+    agent_hashes = trace["agent_hashes"] is not None
+    reference_run = record(reference, trace["seed"], trace["steps"], trace["params"], agent_hashes)
+    candidate = record(engine, trace["seed"], trace["steps"], trace["params"], agent_hashes)
+
+    return {
+        "divergence": compare(trace, candidate, tolerance),
+        "reference_time": reference_run["elapsed"],
+        "candidate_time": candidate["elapsed"],
+        "recorded_time": trace["elapsed"],
+    }
+
+
+def save_trace(trace, path):
+    with open(path, "w") as f:
+        json.dump(trace, f, indent=1)
+
+
+def load_trace(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_engine(spec):
+    """
+
+    Resolves "module:name" to an engine. Mesa model classes are wrapped in ModelEngine
+
+    """
+    import mesa
+
+    module_name, _, name = spec.partition(":")
+    engine = getattr(importlib.import_module(module_name), name)
+    if isinstance(engine, type) and issubclass(engine, mesa.Model):
+        model_class = engine
+
+        def engine(seed, **params):
+            return ModelEngine(seed, model_class, **params)
+
+        engine.__name__ = model_class.__name__
+
+    return engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay golden traces of the Public Good Game")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="record a reference trace")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--engine", default="PGG_model:PublicGoodGame")
+    record_parser.add_argument("--seed", type=int, default=0)
+    record_parser.add_argument("--steps", type=int, default=50)
+    record_parser.add_argument("--agent-hashes", action="store_true")
+
+    replay_parser = subparsers.add_parser("replay", help="replay a trace against a candidate engine")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--engine", default="PGG_model:PublicGoodGame")
+    replay_parser.add_argument("--reference", default="PGG_model:PublicGoodGame")
+    replay_parser.add_argument("--tolerance", type=float, default=0.0)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        trace = record(load_engine(args.engine), args.seed, args.steps, agent_hashes=args.agent_hashes)
+        save_trace(trace, args.path)
+        print(f"Recorded {trace['steps']} ticks of {trace['engine']}, steps took {trace['elapsed']:.3f} s")
+    else:
+        result = replay(load_trace(args.path), load_engine(args.engine), load_engine(args.reference),
+                        args.tolerance)
+        print(f"Steps took {result['reference_time']:.3f} s for the reference, "
+              f"{result['candidate_time']:.3f} s for the candidate "
+              f"({result['recorded_time']:.3f} s when recorded)")
+        if result["divergence"] is None:
+            print("No divergence")
+        else:
+            tick, metric, expected, actual = result["divergence"]
+            print(f"Diverged after {tick} ticks on {metric!r}: expected {expected!r}, got {actual!r}")
+            raise SystemExit(1)
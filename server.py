@@ -1,9 +1,3 @@
-import mesa
-from mesa.visualization.ModularVisualization import ModularServer
-from mesa.visualization.modules import CanvasGrid, ChartModule, TextElement, BarChartModule
-from mesa.visualization.ModularVisualization import CHART_JS_FILE, VisualizationElement
-
-
 from cooperator import Cooperator
 from defector import Defector
 
@@ -50,77 +44,106 @@ def agents_portrayal(agent):
     return portrayal
 
 
-model_params = {
-    "height": 10,
-    "width": 10,
-    "num_cooperators": mesa.visualization.Slider("Number of Cooperators", 20, 0, 100, 5),
-    "defector_ratio": mesa.visualization.Slider("Ratio", 0.5, 0.1, 1.0, 0.05),
-    "altruistic_punishment_freq": mesa.visualization.Slider("Frequency of Punishment", 4, 0, 300, 1),
-}
-
-grid = mesa.visualization.CanvasGrid(agents_portrayal, 10, 10, 500, 500)
-agent_count_graphs = BarChartModule(
-    [
-        {"Label": "Cooperator Count", "Color": "Green"},
-        {"Label": "Defector Count", "Color": "Red"},
-     ],
-    data_collector_name='datacollector',
-)
-
-agent_wealth_graphs = BarChartModule(
-    [
-        {"Label": "Cooperator Average Wealth", "Color": "Green"},
-        {"Label": "Defector Average Wealth", "Color": "Red"},
-        {"Label": "Population Average Wealth", "Color": "Blue"},
-
-     ],
-    data_collector_name='datacollector',
-)
-agent_moral_worth_graphs = BarChartModule(
-    [
-        {"Label": "Cooperator Average Moral Worth:", "Color": "Green"},
-        {"Label": "Defector Average Moral Worth:", "Color": "Red"},
-        {"Label": "Population Average Moral Worth", "Color": "Blue"},
-
-     ],
-    data_collector_name='datacollector',
-)
-
-#Punishment graph
-
-
-punishment_money_graphs = BarChartModule(
-    [
-        {"Label": "AP Money Spent", "Color": "Purple"},
-        {"Label": "AP Money Lost", "Color": "Red"},
-        {"Label": "ASP Money Spent", "Color": "Purple"},
-        {"Label": "ASP Money Lost", "Color": "Red"},
-     ],
-    data_collector_name='datacollector',
-)
-
-punishment_graphs = BarChartModule(
-    [
-        {"Label": "Altruistic Punishment Frequency", "Color": "Purple"},
-        {"Label": "Antisocial Punishment Frequency", "Color": "Red"},
-     ],
-    data_collector_name='datacollector',
-)
-
-common_pool_graph = BarChartModule(
-    [
-        {"Label": "Common Pool Wealth", "Color": "Purple"},
-     ],
-    data_collector_name='datacollector',
-)
-
-
-# server
-server = mesa.visualization.ModularServer(PublicGoodGame,
-                                          [grid, common_pool_graph, agent_count_graphs, agent_wealth_graphs,
-                                           agent_moral_worth_graphs, punishment_money_graphs, punishment_graphs],
-                                          "PublicGoodGame",
-                                          model_params,
-                                          )
-
-
+def build_model_params():
+    """
+
+    Builds the user settable parameters of the visualization
+
+    """
+    import mesa
+
+    return {
+        "height": 10,
+        "width": 10,
+        "num_cooperators": mesa.visualization.Slider("Number of Cooperators", 20, 0, 100, 5),
+        "defector_ratio": mesa.visualization.Slider("Ratio", 0.5, 0.1, 1.0, 0.05),
+        "altruistic_punishment_freq": mesa.visualization.Slider("Frequency of Punishment", 4, 0, 300, 1),
+    }
+
+
+def build_server():
+    """
+
+    Builds the chart modules and the visualization server.
+    The visualization stack is only imported here, so headless workers never pay for it
+
+    """
+    import mesa
+    from mesa.visualization.modules import BarChartModule
+
+    grid = mesa.visualization.CanvasGrid(agents_portrayal, 10, 10, 500, 500)
+    agent_count_graphs = BarChartModule(
+        [
+            {"Label": "Cooperator Count", "Color": "Green"},
+            {"Label": "Defector Count", "Color": "Red"},
+         ],
+        data_collector_name='datacollector',
+    )
+
+    agent_wealth_graphs = BarChartModule(
+        [
+            {"Label": "Cooperator Average Wealth", "Color": "Green"},
+            {"Label": "Defector Average Wealth", "Color": "Red"},
+            {"Label": "Population Average Wealth", "Color": "Blue"},
+
+         ],
+        data_collector_name='datacollector',
+    )
+    agent_moral_worth_graphs = BarChartModule(
+        [
+            {"Label": "Cooperator Average Moral Worth:", "Color": "Green"},
+            {"Label": "Defector Average Moral Worth:", "Color": "Red"},
+            {"Label": "Population Average Moral Worth", "Color": "Blue"},
+
+         ],
+        data_collector_name='datacollector',
+    )
+
+    #Punishment graph
+
+
+    punishment_money_graphs = BarChartModule(
+        [
+            {"Label": "AP Money Spent", "Color": "Purple"},
+            {"Label": "AP Money Lost", "Color": "Red"},
+            {"Label": "ASP Money Spent", "Color": "Purple"},
+            {"Label": "ASP Money Lost", "Color": "Red"},
+         ],
+        data_collector_name='datacollector',
+    )
+
+    punishment_graphs = BarChartModule(
+        [
+            {"Label": "Altruistic Punishment Frequency", "Color": "Purple"},
+            {"Label": "Antisocial Punishment Frequency", "Color": "Red"},
+         ],
+        data_collector_name='datacollector',
+    )
+
+    common_pool_graph = BarChartModule(
+        [
+            {"Label": "Common Pool Wealth", "Color": "Purple"},
+         ],
+        data_collector_name='datacollector',
+    )
+
+
+    # server
+    return mesa.visualization.ModularServer(PublicGoodGame,
+                                            [grid, common_pool_graph, agent_count_graphs, agent_wealth_graphs,
+                                             agent_moral_worth_graphs, punishment_money_graphs, punishment_graphs],
+                                            "PublicGoodGame",
+                                            build_model_params(),
+                                            )
+
+
+def __getattr__(name):
+    # Build the server and its parameters on first access instead of at import time
+    if name == "server":
+        globals()[name] = build_server()
+    elif name == "model_params":
+        globals()[name] = build_model_params()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return globals()[name]
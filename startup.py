@@ -0,0 +1,78 @@
+"""
+
+Measures the start-up cost of the model modules for batch workers.
+Every measurement runs in a fresh interpreter, like a new process-pool worker.
+
+Usage: python startup.py [module ...] [--repeat N]
+
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Optional dependencies a headless worker should not have to load
+heavy_modules = ["mesa.visualization", "tornado", "pandas", "numba"]
+
+_probe = """
+import sys
+import time
+
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start)
+print(",".join(name for name in sys.argv[2:] if name in sys.modules))
+"""
+
+
+def measure_import(module, repeat=5):
+    """
+
+    Imports a module in fresh interpreters and returns the median import time, the median
+    time of the whole process (interpreter start-up included) and the heavy modules it loaded.
+    Raises subprocess.CalledProcessError when the module fails to import
+
+    """
+    import_times = []
+    process_times = []
+    loaded = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", _probe, module] + heavy_modules,
+                                capture_output=True, text=True, check=True)
+        process_times.append(time.perf_counter() - start)
+        import_time, loaded = result.stdout.splitlines()
+        import_times.append(float(import_time))
+
+    return statistics.median(import_times), statistics.median(process_times), loaded.split(",") if loaded else []
+
+
+def report(modules, repeat=5):
+    """
+
+    Prints the start-up cost of each module and returns the modules that failed to import
+
+    """
+    failed = []
+    print(f"{'module':<12}{'import (s)':>12}{'process (s)':>13}  heavy modules loaded")
+    for module in modules:
+        try:
+            import_time, process_time, loaded = measure_import(module, repeat)
+        except subprocess.CalledProcessError as error:
+            failed.append(module)
+            print(f"{module:<12}{'failed':>12}{'-':>13}")
+            print(error.stderr.rstrip())
+            continue
+        print(f"{module:<12}{import_time:>12.3f}{process_time:>13.3f}  {', '.join(loaded) or '-'}")
+
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report worker start-up time")
+    parser.add_argument("modules", nargs="*", default=["kernels", "PGG_model", "server"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if report(args.modules, args.repeat):
+        sys.exit(1)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import kernels
+from cooperator import Cooperator
+from defector import Defector
+from PGG_model import PublicGoodGame
+
+agent_bands = [
+    (Cooperator, kernels.cooperator_probability_bands, kernels.cooperator_contribution_bands),
+    (Defector, kernels.defector_probability_bands, kernels.defector_contribution_bands),
+]
+step_kernels = [kernels.step_agents, kernels._step_agents_numpy, kernels._step_agents_loop]
+
+
+def make_agents(agent_type, n, seed):
+    """
+
+    Agents with moral worth spread over every band, the gaps between bands and NaN
+
+    """
+    model = PublicGoodGame(0, 0, 4, seed=seed)
+    rng = np.random.default_rng(seed)
+    moral_worth = np.concatenate([rng.uniform(-5, 25, n), [4.5, 10.5, 20.5, -0.5, 0, 4, 5, 11, 20, np.nan]])
+    wealth = rng.choice([-1, 0, 0.5, 3, 20, 37.5], moral_worth.shape[0])
+    agents = [agent_type(model.next_id(), model, w) for w in wealth]
+    for agent, value in zip(agents, moral_worth):
+        agent.moral_worth = value
+
+    return agents, moral_worth, wealth
+
+
+@pytest.mark.parametrize("agent_type, probability_bands, contribution_bands", agent_bands)
+def test_band_lookups_match_agent_classes(agent_type, probability_bands, contribution_bands):
+    agents, moral_worth, wealth = make_agents(agent_type, 2000, 1)
+
+    expected_probability = [agent.calculate_probability_contributing() for agent in agents]
+    expected_contribution = [agent.calculate_contribution_amount() for agent in agents]
+
+    assert np.array_equal(kernels.calculate_probability_contributing(moral_worth, list(probability_bands)),
+                          expected_probability)
+    assert np.array_equal(kernels.calculate_contribution_amount(moral_worth, wealth, list(contribution_bands)),
+                          expected_contribution)
+
+
+@pytest.mark.parametrize("step_kernel", step_kernels)
+@pytest.mark.parametrize("agent_type, probability_bands, contribution_bands", agent_bands)
+def test_step_agents_matches_agent_classes(agent_type, probability_bands, contribution_bands, step_kernel):
+    agents, moral_worth, wealth = make_agents(agent_type, 2000, 2)
+
+    np.random.seed(3)
+    expected_invest = []
+    for agent in agents:
+        if agent.wealth > 0:
+            agent.invest = agent.calculate_invest()
+            agent.moral_worth_assignment()
+            expected_invest.append(agent.invest)
+        else:
+            expected_invest.append(0)
+
+    # The agents with wealth drew one number each, in order
+    np.random.seed(3)
+    draws = np.ones(len(agents))
+    draws[wealth > 0] = np.random.random(np.count_nonzero(wealth > 0))
+
+    invest, new_moral_worth = step_kernel(moral_worth, wealth, probability_bands, contribution_bands, draws)
+
+    assert np.array_equal(invest, expected_invest)
+    assert np.array_equal(new_moral_worth, [agent.moral_worth for agent in agents], equal_nan=True)
+
+
+def test_kernel_model_matches_object_model():
+    runs = []
+    for use_kernels in (False, True):
+        model = PublicGoodGame(30, 0.5, 4, seed=4, use_kernels=use_kernels)
+        for _ in range(10):
+            model.step()
+        runs.append(sorted((agent.unique_id, type(agent).__name__, agent.pos, agent.wealth, agent.moral_worth)
+                           for agent in model.schedule.agents))
+
+    assert runs[0] == runs[1]